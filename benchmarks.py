@@ -0,0 +1,267 @@
+# coding: utf-8
+
+"""
+Benchmark suite for the solver on the topologies used in the paper
+
+Every case is one game family (star, clique or cloud) with n nodes in
+all, played strategically or myopically, solved with one engine:
+
+    star   = (1, n - 1) with STAR_ADJ, as in star_plots and timings
+    clique = (n,) with a single self adjacent block, as in clique_plots
+    cloud  = (1, a, 1, b, 1) with GRANT_ADJ and a + b = n - 3 split in
+             half, as in grant_plots and timings
+
+Each case runs in a fresh interpreter, so its peak memory is its own:
+warmup solves first, then repeats timed solves (wall clock), then one
+extra solve with stats=True for the number of states computed and the
+size of the tables. The results are written as JSON and compared with
+earlier outputs. By default every case is checked against BASELINE, a
+run of the default suite committed with the repository, and flagged
+when its expectedYs(), number of states or table size changed at all.
+Those don't depend on the machine, unlike times and memory, which are
+only compared with a baseline given with --baseline, best one run on
+the same machine. A case is then also flagged when its median time or
+peak memory grew by more than the tolerance.
+
+Example Use
+-----------
+
+python benchmarks.py # results checked against benchmarks_baseline.json
+python benchmarks.py --out base.json
+# ... change the engine ...
+python benchmarks.py --out new.json --baseline base.json
+python benchmarks.py --topology star --n 100 200 --engine recursive
+"""
+
+import argparse as _argparse
+import json as _json
+import os as _os
+import platform as _platform
+import resource as _resource
+import subprocess as _subprocess
+import sys as _sys
+import time as _time
+
+import numpy as _np
+
+STAR_ADJ = ((0,1),(1,0))
+CLIQUE_ADJ = ((1,),)
+GRANT_ADJ = ((0,1,0,0,0),(1,0,1,0,0),(0,1,0,1,0),(0,0,1,0,1),(0,0,0,1,0))
+
+# Run of the default suite whose machine independent results (Ey,
+# states, tableBytes) runs are checked against by default
+BASELINE = _os.path.join(_os.path.dirname(_os.path.abspath(__file__)),
+                         'benchmarks_baseline.json')
+
+# Sizes of each topology swept by default
+DEFAULT_N = {'star':   (25, 50, 100, 200, 400),
+             'clique': (25, 50, 100, 200, 400),
+             'cloud':  (8, 12, 16, 20, 24)}
+P, PI = .3, .8
+
+
+def game(topology, n):
+    """
+    Returns the (blockSizes, blockAdjacency) of a topology with n nodes
+    """
+
+    if topology == 'star':
+        return (1, n - 1), STAR_ADJ
+    if topology == 'clique':
+        return (n,), CLIQUE_ADJ
+    if topology == 'cloud':
+        a = int(round((n - 3)*.5))
+        return (1, a, 1, n - 3 - a, 1), GRANT_ADJ
+    raise ValueError('Unknown topology ' + repr(topology))
+
+
+def runCase(case):
+    """
+    Runs one case in this process and returns its measurements
+
+    Parameters
+    ----------
+    case = dict with topology, n, myopic, engine, warmup and repeats
+
+    Return Values
+    -------------
+    result = case plus times (seconds of every repeat), median, min,
+             peakRSS and baseRSS (bytes, after and before solving),
+             states, tableBytes and Ey (expectedYs())
+    """
+
+    from block_dp import StrategicBlockCascadeSolver
+
+    bs, ba = game(case['topology'], case['n'])
+    def solve(**kwargs):
+        return StrategicBlockCascadeSolver(P, PI, bs, ba, case['myopic'],
+                                           engine=case['engine'], **kwargs)
+
+    baseRSS = _maxRSS()
+    for _ in xrange(case['warmup']):
+        solve().expectedYs()
+    times = []
+    for _ in xrange(case['repeats']):
+        start  = _time.time()
+        Ey     = solve().expectedYs()
+        times.append(_time.time() - start)
+    peakRSS = _maxRSS()
+    counted = solve(stats=True)
+    counted.expectedYs()
+    summary = counted.stats.summary()
+
+    result = dict(case)
+    result.update(times=times, median=float(_np.median(times)),
+                  min=min(times), baseRSS=baseRSS, peakRSS=peakRSS,
+                  states=summary['states'], tableBytes=summary['tableBytes'],
+                  Ey=Ey)
+    return result
+
+
+def _maxRSS():
+    # ru_maxrss is in kilobytes on Linux
+    return _resource.getrusage(_resource.RUSAGE_SELF).ru_maxrss*1024
+
+
+def runSuite(topologies, nValues=None, engine='vectorized', modes=(False, True),
+             warmup=1, repeats=5, progress=True):
+    """
+    Runs every case of the suite, each in its own interpreter
+
+    Parameters
+    ----------
+    topologies = sequence of 'star', 'clique' and 'cloud'
+    nValues    = Optional. Sizes to run for every topology. Defaults to
+                 DEFAULT_N.
+    engine     = Optional. Solver engine. Defaults to 'vectorized'.
+    modes      = Optional. myopic values to run. Defaults to both.
+    warmup     = Optional. Untimed solves before timing. Defaults to 1.
+    repeats    = Optional. Timed solves. Defaults to 5.
+    progress   = Optional. Whether to print each case as it finishes.
+
+    Return Values
+    -------------
+    results = list of runCase results
+    """
+
+    results = []
+    for topology in topologies:
+        for n in (nValues or DEFAULT_N[topology]):
+            for myopic in modes:
+                case = dict(topology=topology, n=int(n), myopic=myopic,
+                            engine=engine, warmup=warmup, repeats=repeats)
+                output = _subprocess.check_output(
+                    [_sys.executable, __file__, '--case', _json.dumps(case)])
+                results.append(_json.loads(output))
+                if progress:
+                    r = results[-1]
+                    print '%-6s n=%-4d %-9s %9.4fs %8.1f MB %9d states' % (
+                        topology, n, 'myopic' if myopic else 'strategic',
+                        r['median'], r['peakRSS']/2.**20, r['states'])
+    return results
+
+
+def _caseKey(result):
+    return (result['topology'], result['n'], result['myopic'],
+            result['engine'])
+
+
+def compare(results, baseline, tolerance=.2, noise=.005, timing=True):
+    """
+    Compares results with a baseline run
+
+    Parameters
+    ----------
+    results   = list of runCase results
+    baseline  = list of runCase results of an earlier run
+    tolerance = Optional. Relative growth of median time or peak memory
+                that counts as a regression. Defaults to .2.
+    noise     = Optional. Time differences below this many seconds are
+                never flagged. Defaults to .005.
+    timing    = Optional. Whether to compare times and peak memory, which
+                only makes sense for a baseline run on the same machine.
+                Ey, states and tableBytes are always compared. Defaults
+                to True.
+
+    Return Values
+    -------------
+    regressions = list of (result, reason) pairs
+    """
+
+    base = dict((_caseKey(r), r) for r in baseline)
+    regressions = []
+    for r in results:
+        b = base.get(_caseKey(r))
+        if b is None:
+            continue
+        for field in ('Ey', 'states', 'tableBytes'):
+            if r[field] != b[field]:
+                regressions.append((r, '%s changed from %r to %r' %
+                                    (field, b[field], r[field])))
+        if not timing:
+            continue
+        r['baselineMedian'] = b['median']
+        if r['median'] > b['median']*(1 + tolerance) and \
+                r['median'] - b['median'] > noise:
+            regressions.append((r, 'time %.4fs -> %.4fs' %
+                                (b['median'], r['median'])))
+        if r['peakRSS'] > b['peakRSS']*(1 + tolerance):
+            regressions.append((r, 'peak memory %.1f MB -> %.1f MB' %
+                                (b['peakRSS']/2.**20, r['peakRSS']/2.**20)))
+    return regressions
+
+
+def main(argv=None):
+    parser = _argparse.ArgumentParser(description=__doc__.split('\n')[1])
+    parser.add_argument('--topology', nargs='+',
+                        default=['star', 'clique', 'cloud'],
+                        choices=['star', 'clique', 'cloud'])
+    parser.add_argument('--n', nargs='+', type=int)
+    parser.add_argument('--engine', default='vectorized',
+                        choices=['recursive', 'iterative', 'vectorized',
+                                 'parallel'])
+    parser.add_argument('--mode', nargs='+', default=['strategic', 'myopic'],
+                        choices=['strategic', 'myopic'])
+    parser.add_argument('--warmup', type=int, default=1)
+    parser.add_argument('--repeats', type=int, default=5)
+    parser.add_argument('--out', default='benchmarks.json')
+    parser.add_argument('--check', default=BASELINE)
+    parser.add_argument('--baseline', default='')
+    parser.add_argument('--tolerance', type=float, default=.2)
+    parser.add_argument('--case', help=_argparse.SUPPRESS)
+    args = parser.parse_args(argv)
+
+    if args.case:
+        # Child process of runSuite
+        print _json.dumps(runCase(_json.loads(args.case)))
+        return 0
+
+    results = runSuite(args.topology, args.n, args.engine,
+                       [m == 'myopic' for m in args.mode], args.warmup,
+                       args.repeats)
+    regressions = []
+    if args.baseline:
+        with open(args.baseline) as f:
+            regressions = compare(results, _json.load(f)['results'],
+                                  args.tolerance)
+    elif args.check:
+        with open(args.check) as f:
+            regressions = compare(results, _json.load(f)['results'],
+                                  timing=False)
+    with open(args.out, 'w') as f:
+        _json.dump({'meta': {'python': _platform.python_version(),
+                             'numpy': _np.__version__,
+                             'platform': _platform.platform(),
+                             'date': _time.strftime('%Y-%m-%d %H:%M:%S')},
+                    'results': results}, f, indent=1)
+    print 'Wrote ' + args.out
+
+    for r, reason in regressions:
+        print 'REGRESSION %s n=%d %s: %s' % (
+            r['topology'], r['n'], 'myopic' if r['myopic'] else 'strategic',
+            reason)
+    return 1 if regressions else 0
+
+
+if __name__ == '__main__':
+    _sys.exit(main())
@@ -1,6 +1,6 @@
 import matplotlib.pyplot as plt
 import numpy as np
-from block_dp import StrategicBlockCascadeSolver
+from sweep_store import SweepStore
 
 def makePlot(values, ext, name, xaxis='', yaxis=''):
     ny, nx = values.shape
@@ -19,14 +19,17 @@ def makePlot(values, ext, name, xaxis='', yaxis=''):
     f.savefig(name + '.pdf')
     print 'Created ' + name + '.pdf'
 
-def getStrat(p, pi, n):
-    return StrategicBlockCascadeSolver(p, pi, (n,), ((1,),)).expectedYs()
+# Finished grid rows are kept here, so reruns only solve what's missing
+# and re-plotting doesn't need the solver at all
+STORE = SweepStore('sweep_results')
 
-def getMyop(p, pi, n):
-    return StrategicBlockCascadeSolver(p, pi, (n,), ((1,),), True).expectedYs()
+CLIQUE_ADJ = ((1,),)
 
-getStratV = np.vectorize(getStrat)
-getMyopV  = np.vectorize(getMyop)
+# Strategic/myopic ratios by clique size. solveSizeRange puts n first,
+# the plots want it along the columns
+def cliqueSizeRatio(p, pi, n):
+    from block_dp import strategicMyopic
+    return strategicMyopic(p, pi, (None,), CLIQUE_ADJ, n)[2].T
 
 pr  = (0.01, 0.5)
 pir = (0.01, 10)
@@ -34,23 +37,32 @@ p = np.linspace(pr[0],   pr[1],  40)
 pi = np.linspace(pir[0], pir[1], 40)
 P, PI = np.meshgrid(p, pi)
 
-ratio = getStratV(P,PI,10) / getMyopV(P,PI,10)
+def cliqueRatio(p, pi, n):
+    from block_dp import strategicMyopic
+    return strategicMyopic(p, pi, (n,), CLIQUE_ADJ)[2]
+
+ratio = STORE.open(dict(figure='clique_n10', value='strategic/myopic',
+                        sizes=(10,), adj=CLIQUE_ADJ, p=P, pi=PI),
+                   P.shape).computeRows(
+    lambda j: cliqueRatio(P[j], PI[j], 10))
 makePlot(ratio, pr + pir, 'clique_n10', 'p', 'pi')
 
 pir = (0.01, 5)
 nr  = (1,15)
 n  = np.linspace(nr[0],   nr[1],  15)
 pi = np.linspace(pir[0], pir[1], 40)
-N, PI = np.meshgrid(n, pi)
-
-ratio = getStratV(0.25,PI,N) / getMyopV(0.25,PI,N)
+ratio = STORE.open(dict(figure='clique_p0.25', value='strategic/myopic',
+                        sizes=(None,), adj=CLIQUE_ADJ, p=0.25, pi=pi, n=n),
+                   (len(pi), len(n))).computeRows(
+    lambda j: cliqueSizeRatio(0.25,pi[j],n))
 makePlot(ratio, nr + pir, 'clique_p0.25', 'n', 'pi')
 
 pr = (0.01, 0.5)
 nr  = (1,15)
 n  = np.linspace(nr[0],   nr[1],  15)
 p = np.linspace(pr[0], pr[1], 20)
-N, P = np.meshgrid(n, p)
-
-ratio = getStratV(P,1.5,N) / getMyopV(P,1.5,N)
+ratio = STORE.open(dict(figure='clique_pi1.5', value='strategic/myopic',
+                        sizes=(None,), adj=CLIQUE_ADJ, p=p, pi=1.5, n=n),
+                   (len(p), len(n))).computeRows(
+    lambda j: cliqueSizeRatio(p[j],1.5,n))
 makePlot(ratio, nr + pr, 'clique_pi1.5', 'n', 'p')
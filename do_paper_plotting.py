@@ -1,10 +1,23 @@
 from numpy import *
 from matplotlib.pyplot import *
-from timings import *
+from sweep_store import SweepStore
+
+# Finished points are kept here, so reruns only solve what's missing and
+# re-plotting doesn't need the solver (or timings) at all
+STORE = SweepStore('sweep_results')
+
+# Star game of calc_pi_ratios_star and calc_p_ratios_star in timings
+STAR_ADJ = ((0,1),(1,0))
 
 def do_pi():
     pi = arange(.2, 2, .005)
-    ratios = calc_pi_ratios_star(.45, 20, pi)
+    def piRatios(i):
+        from timings import calc_pi_ratios_star
+        return calc_pi_ratios_star(.45, 20, pi[i])
+    ratios = STORE.open(dict(figure='pi_ratio_p0.45n20',
+                             value='strategic/myopic', sizes=(1, 20),
+                             adj=STAR_ADJ, p=.45, pi=pi), pi.shape).compute(
+        piRatios, array_split(arange(len(pi)), 6))
     
     f = figure()
     plot(pi, ratios, 'or')
@@ -15,7 +28,13 @@ def do_pi():
 
 def do_p():
     p = arange(0.001, .5, .001)
-    ratios = calc_p_ratios_star(.9, 20, p)
+    def pRatios(i):
+        from timings import calc_p_ratios_star
+        return calc_p_ratios_star(.9, 20, p[i])
+    ratios = STORE.open(dict(figure='p_ratio_pi0.9n20',
+                            value='strategic/myopic', sizes=(1, 20),
+                            adj=STAR_ADJ, pi=.9, p=p), p.shape).compute(
+        pRatios, array_split(arange(len(p)), 6))
 
     f = figure()
     plot(p, ratios, 'or')
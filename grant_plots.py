@@ -1,6 +1,6 @@
 import matplotlib.pyplot as plt
 import numpy as np
-from block_dp import StrategicBlockCascadeSolver
+from sweep_store import SweepStore
 
 def makePlot(values, ext, name, xaxis='', yaxis=''):
     ny, nx = values.shape
@@ -19,26 +19,18 @@ def makePlot(values, ext, name, xaxis='', yaxis=''):
     f.savefig(name + '.pdf')
     print 'Created ' + name + '.pdf'
 
-# CHANGE
-def getStrat(p, pi, n, r):
-    m = n-3
-    a = int(round(m*r))
-    b = m-a
-    return StrategicBlockCascadeSolver(p, pi, (1,a,1,b,1),
-        ((0,1,0,0,0),(1,0,1,0,0),(0,1,0,1,0),(0,0,1,0,1),(0,0,0,1,0))
-        ).expectedYs()
+# Finished grid rows are kept here, so reruns only solve what's missing
+# and re-plotting doesn't need the solver at all
+STORE = SweepStore('sweep_results')
+
+CLOUD_ADJ = ((0,1,0,0,0),(1,0,1,0,0),(0,1,0,1,0),(0,0,1,0,1),(0,0,0,1,0))
 
 # CHANGE
-def getMyop(p, pi, n, r):
+def cloudSizes(n, r):
     m = n-3
     a = int(round(m*r))
     b = m-a
-    return StrategicBlockCascadeSolver(p, pi, (1,a,1,b,1),
-        ((0,1,0,0,0),(1,0,1,0,0),(0,1,0,1,0),(0,0,1,0,1),(0,0,0,1,0)),
-        True).expectedYs()
-
-getStratV = np.vectorize(getStrat)
-getMyopV  = np.vectorize(getMyop)
+    return (1,a,1,b,1)
 
 pr  = (0.01, 0.5)
 pir = (0.01, 2)
@@ -46,5 +38,13 @@ p = np.linspace(pr[0],   pr[1],  20)
 pi = np.linspace(pir[0], pir[1], 20)
 P, PI = np.meshgrid(p, pi)
 
-ratio = np.log(getStratV(P,PI,10,0.5) / getMyopV(P,PI,10,0.5))
+def cloudRatio(p, pi, n, r):
+    from block_dp import strategicMyopic
+    return strategicMyopic(p, pi, cloudSizes(n, r), CLOUD_ADJ)[2]
+
+ratio = np.log(STORE.open(dict(figure='cloud_n10_r0.5',
+                               value='strategic/myopic',
+                               sizes=cloudSizes(10, 0.5), adj=CLOUD_ADJ,
+                               p=P, pi=PI), P.shape).computeRows(
+    lambda j: cloudRatio(P[j], PI[j], 10, 0.5)))
 makePlot(ratio, pr + pir, 'cloud_n10_r0.5', 'p', 'pi')
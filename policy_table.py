@@ -0,0 +1,210 @@
+# coding: utf-8
+
+"""
+Compact, memory mappable policy tables for serving solved games
+
+export walks every state a solved game can reach under its optimal
+policy and writes what is needed to play it, the scheduler's block
+choice and the Yes/No answer of a node of either type, to a binary
+file. PolicyTable opens such a file memory mapped and answers the same
+queries as blockChoice and nodeChoice in O(1). It only needs numpy (not
+block_dp or pydot), and processes that open the same file share one
+copy of it in the page cache.
+
+File Layout
+-----------
+
+All integers are little endian.
+
+header   = MAGIC (8 bytes), then uint64 FORMAT_VERSION, B, blockBits,
+           size, blockOffset, blockBytes, nodeOffset, nodeBytes
+sizes    = B uint64 block sizes
+strides  = B uint64 state index strides (see block_dp.BlockStateIndex)
+blocks   = size*blockBits bit big endian bit string at blockOffset. The
+           blockBits bits of state g hold its block choice + 1, or 0 if
+           g isn't reachable or every node has gone
+nodes    = size*B*2 bit big endian bit string at nodeOffset. Bit
+           (g*B + b)*2 + t is set if a node of block b and type t (1 for
+           Yes) chooses Yes in state g
+
+States are numbered by the dense (ns, ys) encoding of BlockStateIndex:
+block b contributes (n_b(n_b+1)/2 + y_b)*strides[b].
+
+Example Use
+-----------
+
+import block_dp as bdp
+import policy_table
+solver = bdp.StrategicBlockCascadeSolver(.5, .5, (1,13,1,13,1), GRANT_ADJ,
+                                         engine='vectorized')
+policy_table.export(solver, 'grant.policy')
+
+# At serve time
+table = policy_table.PolicyTable('grant.policy')
+table.blockChoice((0,0,0,0,0), (0,0,0,0,0))
+table.nodeChoice(1, True, (0,0,0,0,0), (0,0,0,0,0))
+"""
+
+import struct as _struct
+
+import numpy as _np
+
+MAGIC = 'BDPOLICY'
+FORMAT_VERSION = 1
+_HEADER = _struct.Struct('<8s8Q')
+
+
+def export(solver, filename):
+    """
+    Writes the policy of a solved game to filename
+
+    policy_table.export(solver, filename)
+
+    Parameters
+    ----------
+    solver   = StrategicBlockCascadeSolver. It is solved as far as
+               needed. Only the states it can reach from the empty state
+               are written.
+    filename = where to write the table
+
+    Return Values
+    -------------
+    reachable = number of (non terminal) states written
+    """
+
+    # Only the exporting side needs the solver
+    from block_dp import ArrayBlockTable, BlockStateIndex
+
+    assert not solver.valueOnly, "valueOnly solvers don't keep the policy"
+
+    B     = solver.B
+    index = getattr(solver, 'index', None) or BlockStateIndex(solver.bs)
+    array = isinstance(solver.bc, ArrayBlockTable)
+    if array:
+        solver.solve()
+    strides   = _np.array(index.strides, dtype=_np.int64)
+    sizes     = _np.array(solver.bs, dtype=_np.int64)
+    blockBits = max(1, B.bit_length())
+
+    blocks = _np.zeros(index.size, dtype=_np.uint8) # choice + 1
+    nodes  = _np.zeros((index.size, B, 2), dtype=bool)
+    # Every move adds one node, so the reachable states can be found one
+    # sum(ns) layer at a time
+    g = _np.zeros(1, dtype=_np.int64)
+    reachable = 0
+    for _ in xrange(sum(solver.bs)):
+        NS, YS = index.decodeArrays(g)
+        if array:
+            b = solver.bc.choice[g].astype(_np.int64)
+            choice = solver.nc.choice[g] == 1
+            # Choices missing from the tables, e.g. those of the blocks
+            # branchAndBound skipped, are looked up like dict ones
+            lookup = _np.flatnonzero((b < 0) | ((solver.nc.choice[g] < 0) &
+                                                (NS < sizes)[:, :, None])
+                                     .any(axis=(1, 2)))
+        else:
+            b = _np.empty(len(g), dtype=_np.int64)
+            choice = _np.zeros((len(g), B, 2), dtype=bool)
+            lookup = xrange(len(g))
+        for i in lookup:
+            ns, ys = tuple(NS[i].tolist()), tuple(YS[i].tolist())
+            b[i] = solver.blockChoice(ns, ys)[0]
+            for j in xrange(B):
+                if ns[j] < solver.bs[j]:
+                    choice[i, j] = [solver.nodeChoice(j, t, ns, ys)[0]
+                                    for t in (False, True)]
+        blocks[g] = b + 1
+        nodes[g]  = choice
+        reachable += len(g)
+
+        # Children reached by a node of either type
+        rows = _np.arange(len(g))
+        step = (NS[rows, b] + 1)*strides[b]
+        g = _np.unique(_np.concatenate([
+            g + step + choice[rows, b, t]*strides[b] for t in (0, 1)]))
+
+    bits = _np.unpackbits(blocks[:, None], axis=1)[:, 8 - blockBits:]
+    blockData = _np.packbits(bits.ravel())
+    nodeData  = _np.packbits(nodes.ravel())
+
+    tables = _HEADER.size + 16*B
+    blockOffset = (tables + 7)//8*8
+    nodeOffset  = (blockOffset + len(blockData) + 7)//8*8
+    with open(filename, 'wb') as f:
+        f.write(_HEADER.pack(MAGIC, FORMAT_VERSION, B, blockBits,
+                             index.size, blockOffset, len(blockData),
+                             nodeOffset, len(nodeData)))
+        f.write(_np.array(solver.bs, dtype='<u8').tostring())
+        f.write(_np.array(index.strides, dtype='<u8').tostring())
+        f.write('\0'*(blockOffset - tables))
+        f.write(blockData.tostring())
+        f.write('\0'*(nodeOffset - blockOffset - len(blockData)))
+        f.write(nodeData.tostring())
+    return reachable
+
+
+class PolicyTable(object):
+    """
+    Read only, memory mapped policy written by export
+    """
+
+    def __init__(self, filename):
+        """
+        Parameters
+        ----------
+        filename = a file written by export
+        """
+
+        data = _np.memmap(filename, dtype=_np.uint8, mode='r')
+        header = _HEADER.unpack(data[:_HEADER.size].tostring())
+        magic, version, B, blockBits, size, blockOffset, blockBytes, \
+            nodeOffset, nodeBytes = header
+        assert magic == MAGIC, "Not a policy table"
+        assert version == FORMAT_VERSION, "Unsupported policy table version"
+
+        self.B    = int(B)
+        tables    = data[_HEADER.size:_HEADER.size + 16*B].tostring()
+        self.bs   = tuple(int(s) for s in
+                          _np.fromstring(tables[:8*B], dtype='<u8'))
+        self.strides = tuple(int(s) for s in
+                             _np.fromstring(tables[8*B:], dtype='<u8'))
+        self.size = int(size)
+        self.blockBits = int(blockBits)
+        self.blocks = data[blockOffset:blockOffset + blockBytes]
+        self.nodes  = data[nodeOffset:nodeOffset + nodeBytes]
+
+    def encode(self, ns, ys):
+        """
+        Returns the integer index of the state (ns, ys)
+        """
+
+        return sum((n*(n + 1)//2 + y)*st for n, y, st in
+                   zip(ns, ys, self.strides))
+
+    def blockChoice(self, ns, ys):
+        """
+        Returns the [0,B) block the scheduler picks next in the state
+        (ns, ys). Raises KeyError for states the policy never reaches.
+        """
+
+        pos   = self.encode(ns, ys)*self.blockBits
+        first = pos >> 3
+        last  = (pos + self.blockBits - 1) >> 3
+        word  = 0
+        for byte in self.blocks[first:last + 1]:
+            word = word << 8 | int(byte)
+        value = word >> ((last + 1)*8 - pos - self.blockBits) & \
+            ((1 << self.blockBits) - 1)
+        if value == 0:
+            raise KeyError((ns, ys))
+        return value - 1
+
+    def nodeChoice(self, b, t, ns, ys):
+        """
+        Returns whether a node of block b and type t (True for Yes)
+        chooses Yes in the state (ns, ys). Only meaningful for states
+        blockChoice knows.
+        """
+
+        bit = (self.encode(ns, ys)*self.B + b)*2 + int(t)
+        return bool(self.nodes[bit >> 3] >> (7 - (bit & 7)) & 1)
@@ -0,0 +1,203 @@
+# coding: utf-8
+
+"""
+Online play of solved games
+
+A GameSession follows one live game against a StrategicBlockCascadeSolver.
+It starts at the empty state, tells the caller which block to schedule
+next, and is told whether the node it scheduled said Yes or No. The
+state is kept as its BlockStateIndex number, which every outcome moves
+on by one addition, so with array tables (storage='array') a query is a
+single array read (a dict lookup with dict tables). States the solver
+hasn't computed yet are computed on first touch through blockChoice:
+the recursive engine fills in just the subgames it needs, the others
+solve the whole game once.
+
+A SessionBatch does the same for many concurrent games with NumPy
+arrays, one element per game.
+
+Example Use
+-----------
+
+import block_dp as bdp
+from session import GameSession, SessionBatch
+solver  = bdp.StrategicBlockCascadeSolver(.5, .5, (1,13,1,13,1), GRANT_ADJ,
+                                          engine='vectorized')
+session = GameSession(solver)
+while not session.done:
+    b = session.nextBlock()
+    session.observe(askNodeFrom(b))
+
+batch = SessionBatch(solver, 10000)
+blocks = batch.nextBlocks()
+batch.observe(answers) # bool array of the 10000 answers
+"""
+
+import numpy as _np
+
+from block_dp import ArrayBlockTable, BlockStateIndex
+
+
+class GameSession(object):
+    """
+    One game played against a solver, one node at a time
+    """
+
+    def __init__(self, solver):
+        """
+        Parameters
+        ----------
+        solver = StrategicBlockCascadeSolver of the game. It must keep
+                 its tables (not valueOnly).
+        """
+
+        assert not solver.valueOnly, "valueOnly solvers don't keep the policy"
+
+        self.solver = solver
+        self.index  = getattr(solver, 'index', None) or \
+            BlockStateIndex(solver.bs)
+        self.array  = isinstance(solver.bc, ArrayBlockTable)
+        self.g  = 0
+        self.ns = (0,)*solver.B
+        self.ys = (0,)*solver.B
+        self.left = sum(solver.bs)
+        self._block = None
+
+    @property
+    def done(self):
+        """
+        Whether every node has been scheduled
+        """
+
+        return self.left == 0
+
+    def nextBlock(self):
+        """
+        Returns the [0,B) block to schedule next
+        """
+
+        assert not self.done, "The game is over"
+
+        if self._block is None:
+            if self.array:
+                b = int(self.solver.bc.choice[self.g])
+            else:
+                b = self.solver.bc.get((self.ns, self.ys), (-1,))[0]
+            if b < 0:
+                # Computed on first touch
+                b = self.solver.blockChoice(self.ns, self.ys)[0]
+            self._block = b
+        return self._block
+
+    def observe(self, yes):
+        """
+        Records the choice of the node scheduled from nextBlock()
+
+        Parameters
+        ----------
+        yes = whether the node chose Yes
+        """
+
+        b = self.nextBlock()
+        n = self.ns[b]
+        self.g  += (n + 1 + bool(yes))*self.index.strides[b]
+        self.ns  = self.ns[:b] + (n + 1,) + self.ns[b+1:]
+        if yes:
+            self.ys = self.ys[:b] + (self.ys[b] + 1,) + self.ys[b+1:]
+        self.left  -= 1
+        self._block = None
+
+
+class SessionBatch(object):
+    """
+    Many concurrent games played against the same solver
+    """
+
+    def __init__(self, solver, sessions):
+        """
+        Parameters
+        ----------
+        solver   = StrategicBlockCascadeSolver of the game. It must keep
+                   its tables (not valueOnly).
+        sessions = number of concurrent games
+        """
+
+        assert not solver.valueOnly, "valueOnly solvers don't keep the policy"
+
+        self.solver  = solver
+        self.index   = getattr(solver, 'index', None) or \
+            BlockStateIndex(solver.bs)
+        self.array   = isinstance(solver.bc, ArrayBlockTable)
+        self.strides = _np.array(self.index.strides, dtype=_np.int64)
+        self.g  = _np.zeros(sessions, dtype=_np.int64)
+        self.NS = _np.zeros((sessions, solver.B), dtype=_np.int64)
+        self.YS = _np.zeros((sessions, solver.B), dtype=_np.int64)
+        self.left = _np.empty(sessions, dtype=_np.int64)
+        self.reset()
+
+    def reset(self, rows=None):
+        """
+        Starts new games in the given sessions (a bool mask or indices),
+        or in all of them
+        """
+
+        rows = slice(None) if rows is None else rows
+        self.g[rows]  = 0
+        self.NS[rows] = 0
+        self.YS[rows] = 0
+        self.left[rows] = sum(self.solver.bs)
+
+    @property
+    def done(self):
+        """
+        Bool array of the sessions whose games are over
+        """
+
+        return self.left == 0
+
+    def nextBlocks(self):
+        """
+        Returns an int array of the block to schedule next in every
+        session, -1 for the ones whose games are over
+        """
+
+        blocks = _np.empty(len(self.g), dtype=_np.int64)
+        blocks.fill(-1)
+        live = _np.flatnonzero(self.left > 0)
+        if self.array:
+            blocks[live] = self.solver.bc.choice[self.g[live]]
+            missing = live[blocks[live] < 0]
+        else:
+            missing = live
+        if len(missing):
+            # Computed on first touch, once per distinct state
+            unique, inverse = _np.unique(self.g[missing],
+                                         return_inverse=True)
+            choices = [self.solver.blockChoice(*self.index.decode(g))[0]
+                       for g in unique]
+            blocks[missing] = _np.array(choices, dtype=_np.int64)[inverse]
+        return blocks
+
+    def observe(self, yes, blocks=None):
+        """
+        Records the choices of the nodes scheduled in every live session
+
+        Parameters
+        ----------
+        yes    = bool array with one element per session of whether its
+                 node chose Yes. Sessions whose games are over are
+                 skipped.
+        blocks = Optional. The result of nextBlocks(), if the caller
+                 already has it
+        """
+
+        if blocks is None:
+            blocks = self.nextBlocks()
+        yes  = _np.asarray(yes, dtype=bool)
+        live = _np.flatnonzero(self.left > 0)
+        b = blocks[live]
+        n = self.NS[live, b]
+        self.g[live] += (n + 1 + yes[live])*self.strides[b]
+        self.NS[live, b] = n + 1
+        self.YS[live, b] += yes[live]
+        self.left[live] -= 1
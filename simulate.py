@@ -0,0 +1,122 @@
+# coding: utf-8
+
+"""
+Monte Carlo simulation of games played under a solved policy
+
+Many independent games are played in lockstep as NumPy arrays. At every
+step each game draws the type of the next node (Yes with probability
+p), the scheduler picks a block from the solver's block choices (or from
+a scheduler function given for comparison), and the node answers with
+the solver's node choice for its state and type. The result is the
+realized number of Yes nodes in each block of every game, whose mean
+approaches the analytic Ey_b of the solver.
+
+Example Use
+-----------
+
+import block_dp as bdp
+import simulate
+solver = bdp.StrategicBlockCascadeSolver(.5, .5, (1,13,1,13,1), GRANT_ADJ,
+                                         engine='vectorized')
+YS = simulate.simulate(solver, 10**6, seed=0)
+YS.sum(axis=1).mean(), YS.sum(axis=1).std()
+
+# A scheduler that always takes the lowest block with nodes left
+def firstBlock(NS, YS):
+    return (NS < solver.bs).argmax(axis=1)
+YS = simulate.simulate(solver, 10**6, firstBlock)
+"""
+
+import numpy as _np
+
+from block_dp import ArrayBlockTable, BlockStateIndex
+
+
+def simulate(solver, games, scheduler=None, seed=None):
+    """
+    Plays games independent games under the policy of a solver
+
+    simulate.simulate(solver, games)
+    simulate.simulate(solver, games, scheduler, seed)
+
+    Parameters
+    ----------
+    solver    = StrategicBlockCascadeSolver whose choices are played. It
+                is solved first if it hasn't been.
+    games     = number of games to play
+    scheduler = Optional. Function taking the games x B arrays NS and YS
+                of the states of the games still being played and
+                returning the block to pick next in each of them. Nodes
+                still answer as in the solved game. Defaults to the
+                solver's block choices.
+    seed      = Optional. Seed or numpy RandomState for the node types.
+
+    Return Values
+    -------------
+    YS = games x B int array of the number of Yes nodes in each block at
+         the end of every game
+    """
+
+    assert not solver.valueOnly, "valueOnly solvers don't keep the policy"
+
+    rng   = seed if isinstance(seed, _np.random.RandomState) else \
+        _np.random.RandomState(seed)
+    index = getattr(solver, 'index', None) or BlockStateIndex(solver.bs)
+    array = isinstance(solver.bc, ArrayBlockTable)
+    if array:
+        solver.solve()
+    sizes   = _np.array(solver.bs)
+    strides = _np.array(index.strides, dtype=_np.int64)
+
+    g  = _np.zeros(games, dtype=_np.int64) # state index of every game
+    NS = _np.zeros((games, solver.B), dtype=_np.int64)
+    YS = _np.zeros((games, solver.B), dtype=_np.int64)
+    rows = _np.arange(games)
+    for _ in xrange(sum(solver.bs)):
+        # Types of the nodes picked in this step
+        T = rng.random_sample(games) < solver.p
+
+        if scheduler is not None:
+            b = _np.asarray(scheduler(NS, YS), dtype=_np.int64)
+            assert b.shape == (games,), "scheduler must return one block per game"
+            assert (NS[rows, b] < sizes[b]).all(), "scheduler picked a full block"
+        elif array:
+            b = solver.bc.choice[g].astype(_np.int64)
+        else:
+            b = _lookup(g, lambda ns, ys: solver.blockChoice(ns, ys)[0],
+                        index)
+
+        if array:
+            choice = solver.nc.choice[g, b, T.astype(_np.int64)] == 1
+        else:
+            # One lookup per distinct (state, block, type)
+            key = (g*solver.B + b)*2 + T
+            choice = _lookup(key, lambda ns, ys, k: solver.nodeChoice(
+                k//2 % solver.B, bool(k % 2), ns, ys)[0], index,
+                key//(2*solver.B))
+
+        # A No moves digit b of the state index on by n_b + 1, a Yes by
+        # n_b + 2 (see BlockStateIndex)
+        g += (NS[rows, b] + 1 + choice)*strides[b]
+        NS[rows, b] += 1
+        YS[rows, b] += choice
+
+    return YS
+
+
+def _lookup(keys, func, index, states=None):
+    """
+    Returns func(ns, ys) (or func(ns, ys, key)) for every key, calling it
+    once per distinct key. states are the state indices of the keys, if
+    they aren't the keys themselves.
+    """
+
+    unique, inverse = _np.unique(keys, return_inverse=True)
+    if states is None:
+        values = [func(*index.decode(k)) for k in unique]
+    else:
+        firsts = _np.zeros(len(unique), dtype=_np.int64)
+        firsts[inverse] = states
+        values = [func(*(index.decode(s) + (k,)))
+                  for k, s in zip(unique, firsts)]
+    return _np.array(values)[inverse]
@@ -0,0 +1,145 @@
+# coding: utf-8
+
+"""
+On-disk cache of solved DP tables
+
+A SolutionCache is a directory with one subdirectory per solved game.
+Each entry holds the array tables of a StrategicBlockCascadeSolver
+(storage='array') as .npy files, which are opened memory mapped, so a
+new solver for a game that was solved before, possibly by another
+process, serves blockChoice/nodeChoice straight from the page cache
+without reading the tables into memory.
+
+Entries are keyed by a hash of the game definition (p, pi, blockSizes,
+blockAdjacency, myopic), the table layout (dtype) and FORMAT_VERSION,
+which must be bumped whenever the meaning of the stored arrays changes.
+
+Writers build an entry in a private temporary directory and rename it
+into place, which is atomic, so readers never see half written entries
+and concurrent writers of the same game just discard the losing copy.
+Reading an entry touches its modification time, and after every write
+the least recently used entries are removed until the cache is under
+its size cap.
+
+Example Use
+-----------
+
+import block_dp as bdp
+from solution_cache import SolutionCache
+cache  = SolutionCache('/tmp/block_dp_cache')
+solver = bdp.StrategicBlockCascadeSolver(.5, .5, (1,13,1,13,1), GRANT_ADJ,
+                                         engine='vectorized', cache=cache)
+solver.expectedYs()
+"""
+
+import errno as _errno
+import hashlib as _hashlib
+import os as _os
+import shutil as _shutil
+import tempfile as _tempfile
+
+import numpy as _np
+
+FORMAT_VERSION = 1
+
+
+class SolutionCache(object):
+    """
+    Directory of memory mapped solved tables with LRU eviction
+    """
+
+    def __init__(self, directory, maxBytes=2**30):
+        """
+        Parameters
+        ----------
+        directory = where the entries are kept. Created if missing.
+        maxBytes  = Optional. Size cap of the cache in bytes. Defaults
+                    to 1 GiB.
+        """
+
+        self.directory = directory
+        self.maxBytes  = maxBytes
+        try:
+            _os.makedirs(directory)
+        except OSError as e:
+            if e.errno != _errno.EEXIST:
+                raise
+
+    def key(self, p, pi, blockSizes, blockAdjacency, myopic, dtype='float64'):
+        """
+        Returns the entry name of a game definition and table layout
+        """
+
+        definition = (FORMAT_VERSION, repr(float(p)), repr(float(pi)),
+                      tuple(blockSizes), tuple(blockAdjacency),
+                      bool(myopic), _np.dtype(dtype).str)
+        return _hashlib.sha1(repr(definition)).hexdigest()
+
+    def load(self, key):
+        """
+        Returns a dict of read only memory mapped arrays stored under
+        key, or None if there is no such entry
+        """
+
+        path = _os.path.join(self.directory, key)
+        try:
+            arrays = dict((name[:-4], _np.load(_os.path.join(path, name),
+                                               mmap_mode='r'))
+                          for name in _os.listdir(path)
+                          if name.endswith('.npy'))
+            _os.utime(path, None)
+        except (IOError, OSError, ValueError):
+            # Missing, or evicted while we were reading it
+            return None
+        return arrays or None
+
+    def store(self, key, arrays):
+        """
+        Stores a dict of arrays under key, unless another writer got
+        there first, and then evicts old entries
+        """
+
+        tmp = _tempfile.mkdtemp(prefix='.tmp-', dir=self.directory)
+        try:
+            for name, array in arrays.iteritems():
+                _np.save(_os.path.join(tmp, name + '.npy'), array)
+            _os.rename(tmp, _os.path.join(self.directory, key))
+        except OSError as e:
+            if e.errno not in (_errno.EEXIST, _errno.ENOTEMPTY):
+                raise
+        finally:
+            _shutil.rmtree(tmp, ignore_errors=True)
+        self.evict()
+
+    def evict(self):
+        """
+        Removes least recently used entries until the cache is no larger
+        than maxBytes
+        """
+
+        entries = []
+        total   = 0
+        for key in _os.listdir(self.directory):
+            path = _os.path.join(self.directory, key)
+            if key.startswith('.'):
+                continue
+            try:
+                size = sum(_os.path.getsize(_os.path.join(path, name))
+                           for name in _os.listdir(path))
+                entries.append((_os.path.getmtime(path), size, key))
+            except OSError:
+                continue
+            total += size
+
+        for _, size, key in sorted(entries):
+            if total <= self.maxBytes:
+                break
+            # Rename first so readers never open a half deleted entry
+            trash = _tempfile.mkdtemp(prefix='.evict-', dir=self.directory)
+            try:
+                _os.rename(_os.path.join(self.directory, key),
+                           _os.path.join(trash, key))
+            except OSError:
+                pass # Someone else evicted it
+            _shutil.rmtree(trash, ignore_errors=True)
+            total -= size
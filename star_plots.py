@@ -1,23 +1,31 @@
 import matplotlib.pyplot as plt
 import time
-from block_dp import StrategicBlockCascadeSolver
 from numpy import arange, zeros
 from pylab import *
+from sweep_store import SweepStore
 
 STAR_ADJ = ((0,1),(1,0))
 
-def p_vs_pi(p, pi):
-    return StrategicBlockCascadeSolver(p, pi, (1, 10), STAR_ADJ).expectedYs() / \
-           StrategicBlockCascadeSolver(p, pi, (1, 10), STAR_ADJ, True).expectedYs()
+# Finished grid rows are kept here, so reruns only solve what's missing
+# and re-plotting doesn't need the solver at all
+STORE = SweepStore('sweep_results')
 
+# game holds every parameter of the game that isn't along an axis
+def p_vs_pi(p, pi, game):
+    from block_dp import strategicMyopic
+    return strategicMyopic(p, pi, game['sizes'], game['adj'])[2]
 
-def p_vs_n(p, n):
-    return StrategicBlockCascadeSolver(p, .9, (1, n), STAR_ADJ).expectedYs() / \
-           StrategicBlockCascadeSolver(p, .9, (1, n), STAR_ADJ, True).expectedYs()
 
-def pi_vs_n(pi, n):
-    return StrategicBlockCascadeSolver(.45, pi, (1, n), STAR_ADJ).expectedYs() / \
-           StrategicBlockCascadeSolver(.45, pi, (1, n), STAR_ADJ, True).expectedYs()
+# n runs down the columns of the meshgrids, so solve every n in one pass
+def p_vs_n(p, n, game):
+    from block_dp import strategicMyopic
+    return strategicMyopic(p[0], game['pi'], game['sizes'], game['adj'],
+                           n[:, 0])[2]
+
+def pi_vs_n(pi, n, game):
+    from block_dp import strategicMyopic
+    return strategicMyopic(game['p'], pi[0], game['sizes'], game['adj'],
+                           n[:, 0])[2]
 
 
 def do_plotting(xlist,ylist, Z, x_start, x_inc, y_start, y_inc, dim, xlabel, ylabel, name):
@@ -33,17 +41,29 @@ def do_plotting(xlist,ylist, Z, x_start, x_inc, y_start, y_inc, dim, xlabel, yla
     plt.colorbar()
     f.savefig(name + '.pdf')
 
-def x_vs_y(x_start, x_inc, y_start, y_inc, dim, func, x_label, y_label, name):
+def x_vs_y(x_start, x_inc, y_start, y_inc, dim, func, game, x_label, y_label,
+           name):
     x_list = arange(x_start, x_start + x_inc * float(dim), x_inc)
     y_list = arange(y_start, y_start + y_inc * float(dim), y_inc)
-    Z = zeros((dim, dim))
-    for i in range(dim):
-        for j in range(dim):
-            Z[j, i] = func(x_list[i], y_list[j])
+    # func takes whole columns of the meshgrids, Z[:, c] = func(X[:, c],
+    # Y[:, c]), so it sees every y at once. A few columns are solved and
+    # stored at a time.
+    X, Y = meshgrid(x_list, y_list)
+    definition = dict(game, figure=name, value='strategic/myopic',
+                      func=func.__name__, x=X, y=Y)
+    def columns(i):
+        c = unique(i % dim)
+        return func(X[:, c], Y[:, c], game)[i//dim, searchsorted(c, i % dim)]
+    Z = STORE.open(definition, X.shape).compute(
+        columns, [i.ravel() for i in array_split(arange(X.size).reshape(
+            X.shape), 4, axis=1)])
     do_plotting(x_list, y_list, Z, x_start, x_inc, 
                 y_start, y_inc, dim, x_label, y_label, name)
     return x_list, y_list, Z
 
-x_vs_y(.1, .01, .2, .025, 40, p_vs_pi, 'p', 'pi', 'star_n10')
-x_vs_y(.1, .01, 1, 1, 40, p_vs_n, 'p', 'n', 'star_pi0.9')
-x_vs_y(.2, .025, 1, 1, 40, pi_vs_n, 'pi', 'n', 'star_p0.45')
+x_vs_y(.1, .01, .2, .025, 40, p_vs_pi, dict(sizes=(1, 10), adj=STAR_ADJ),
+       'p', 'pi', 'star_n10')
+x_vs_y(.1, .01, 1, 1, 40, p_vs_n, dict(sizes=(1, None), adj=STAR_ADJ, pi=.9),
+       'p', 'n', 'star_pi0.9')
+x_vs_y(.2, .025, 1, 1, 40, pi_vs_n, dict(sizes=(1, None), adj=STAR_ADJ, p=.45),
+       'pi', 'n', 'star_p0.45')
@@ -0,0 +1,158 @@
+# coding: utf-8
+
+"""
+Process pool runner for parameter sweeps
+
+Sweeps over p, pi and a single varying block size are solved in one
+pass by block_dp.expectedYsGrid and solveSizeRange. The games of other
+sweeps, such as the cloud games of timings.calc_timings_grant, where n
+changes two block sizes at once, don't share a state space and are
+solved one by one here. Each game is described by a job tuple
+
+    (p, pi, blockSizes, blockAdjacency, myopic)
+
+and solved with the vectorized engine in a worker process. Jobs are
+handed out largest first (the cost of a game grows steeply with its
+block sizes), one at a time, so a big game never ends up queued behind
+a worker that is still busy with a batch of small ones.
+
+Example Use
+-----------
+
+import sweep
+def starJob(p, pi, n, myopic):
+    return (p, pi, (1, int(n)), ((0,1),(1,0)), myopic)
+N, PI = np.meshgrid(np.arange(1, 41), np.arange(.2, 1.2, .025))
+Ey = sweep.sweep(starJob, .45, PI, N, False)
+"""
+
+import multiprocessing as _mp
+import sys as _sys
+import time as _time
+
+import numpy as _np
+
+from block_dp import StrategicBlockCascadeSolver, BlockStateIndex
+
+
+def solveJob(job, engine='vectorized'):
+    """
+    Returns expectedYs() of the game described by a job tuple
+    """
+
+    p, pi, bs, ba, myopic = job
+    return StrategicBlockCascadeSolver(p, pi, bs, ba, myopic,
+                                       engine=engine).expectedYs()
+
+
+def timeJob(job, engine='vectorized'):
+    """
+    Returns expectedYs() of the game described by a job tuple and the
+    wall clock time the solve took
+    """
+
+    start = _time.time()
+    Ey = solveJob(job, engine)
+    return Ey, _time.time() - start
+
+
+def jobCost(job):
+    """
+    Rough relative cost of solving a job: the number of states times
+    the number of blocks
+    """
+
+    bs = job[2]
+    return BlockStateIndex(bs).size*len(bs)
+
+
+def _solveIndexedJob(indexedJob):
+    i, job, engine, timed = indexedJob
+    return i, (timeJob if timed else solveJob)(job, engine)
+
+
+def runJobs(jobs, processes=None, progress=True, engine='vectorized',
+            timed=False):
+    """
+    Solves a list of jobs on a process pool
+
+    sweep.runJobs(jobs)
+    sweep.runJobs(jobs, processes, progress)
+    sweep.runJobs(jobs, engine='recursive', timed=True)
+
+    Parameters
+    ----------
+    jobs      = list of (p, pi, blockSizes, blockAdjacency, myopic)
+                tuples
+    processes = Optional. Number of worker processes. Defaults to the
+                number of CPUs.
+    progress  = Optional. Whether to report progress on stderr while
+                jobs finish. Defaults to True.
+    engine    = Optional. Engine of StrategicBlockCascadeSolver to solve
+                with. Defaults to 'vectorized'.
+    timed     = Optional. Whether to also return the wall clock time of
+                every solve. Each worker solves one job at a time, but
+                workers still share memory bandwidth, so times are only
+                free of that with processes=1. Defaults to False.
+
+    Return Values
+    -------------
+    results = list of expectedYs() values in the same order as jobs, or
+              of (expectedYs(), seconds) tuples if timed
+    """
+
+    jobs    = list(jobs)
+    results = [None]*len(jobs)
+    if not jobs:
+        return results
+
+    # Longest processing time first
+    order = sorted(xrange(len(jobs)), key=lambda i: -jobCost(jobs[i]))
+
+    start = _time.time()
+    pool  = _mp.Pool(processes)
+    try:
+        finished = pool.imap_unordered(_solveIndexedJob,
+                                       [(i, jobs[i], engine, timed)
+                                        for i in order], 1)
+        for done, (i, value) in enumerate(finished, 1):
+            results[i] = value
+            if progress:
+                _sys.stderr.write('\r%d/%d jobs done (%.1fs)' %
+                                  (done, len(jobs), _time.time() - start))
+                _sys.stderr.flush()
+    finally:
+        pool.close()
+        pool.join()
+    if progress:
+        _sys.stderr.write('\n')
+    return results
+
+
+def sweep(makeJob, *grids, **kwargs):
+    """
+    Solves makeJob(*args) for every element of broadcast grids
+
+    sweep.sweep(makeJob, X, Y)
+    sweep.sweep(makeJob, X, Y, processes=8, progress=False)
+
+    Parameters
+    ----------
+    makeJob = function that takes one element of each grid and returns
+              a job tuple. It runs in this process, so it doesn't need
+              to be picklable.
+    grids   = arrays (or scalars) that are broadcast against each other,
+              e.g. the outputs of np.meshgrid
+    kwargs  = processes, progress and engine, passed on to runJobs
+
+    Return Values
+    -------------
+    Ey = array with the broadcast shape of the grids holding the
+         expectedYs() value of each job
+    """
+
+    grids = _np.broadcast_arrays(*[_np.asarray(x) for x in grids])
+    jobs  = [makeJob(*args) for args in zip(*[x.ravel() for x in grids])]
+    results = runJobs(jobs, **kwargs)
+    return _np.reshape(_np.array(results, dtype=_np.float64),
+                       grids[0].shape)
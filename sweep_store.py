@@ -0,0 +1,256 @@
+# coding: utf-8
+
+"""
+Checkpointed, resumable store of sweep results
+
+A SweepStore is a directory with one subdirectory per sweep. A sweep is
+a grid of points whose values are computed by the figure scripts, and
+is keyed by a hash of its definition: whatever describes what is
+computed, such as the name of the figure, the value computed, every
+parameter of the game (block sizes, adjacency and whatever is fixed) and
+the grid coordinates, together with the grid shape, FORMAT_VERSION and
+SOLVER_VERSION.
+
+Points are committed as they finish, as small append only chunk files
+holding the flat grid indices and values of the points. Each chunk is
+written to a temporary file and renamed into place, which is atomic, so
+an interrupted sweep loses at most the points that weren't committed
+yet, and opening the sweep again picks up where it stopped. Reading a
+sweep only needs numpy, so re-plotting from a complete store never
+imports the solver.
+
+Example Use
+-----------
+
+from sweep_store import SweepStore
+store = SweepStore('sweep_results')
+P, PI = np.meshgrid(np.linspace(.01, .5, 40), np.linspace(.01, 10, 40))
+results = store.open(dict(figure='clique', value='strategic/myopic',
+                           sizes=(10,), adj=((1,),), p=P, pi=PI), P.shape)
+def ratios(i):
+    import block_dp as bdp # only when some points are missing
+    return bdp.strategicMyopic(P.flat[i], PI.flat[i], (10,), ((1,),))[2]
+ratio = results.compute(ratios) # one chunk per row of the grid
+"""
+
+import errno as _errno
+import hashlib as _hashlib
+import os as _os
+import tempfile as _tempfile
+import time as _time
+
+import numpy as _np
+
+FORMAT_VERSION = 1
+
+# Version of the values block_dp computes. Bump it when a change to the
+# solver alters its results, so that sweeps computed before are computed
+# again instead of being read back
+SOLVER_VERSION = '1'
+
+
+def _canonical(x):
+    """
+    Returns x with arrays, lists and numpy scalars turned into tuples and
+    Python numbers, so that its repr is stable
+    """
+
+    if isinstance(x, _np.ndarray):
+        return ('array', x.dtype.str, x.shape, tuple(x.ravel().tolist()))
+    if isinstance(x, _np.generic):
+        return x.item()
+    if isinstance(x, (list, tuple)):
+        return tuple(_canonical(y) for y in x)
+    if isinstance(x, dict):
+        return tuple(sorted((k, _canonical(v)) for k, v in x.iteritems()))
+    return x
+
+
+class SweepStore(object):
+    """
+    Directory of checkpointed sweeps
+    """
+
+    def __init__(self, directory):
+        """
+        Parameters
+        ----------
+        directory = where the sweeps are kept. Created if missing.
+        """
+
+        self.directory = directory
+        _makedirs(directory)
+
+    def key(self, definition, shape):
+        """
+        Returns the name of the sweep with a definition and grid shape
+        """
+
+        definition = (FORMAT_VERSION, SOLVER_VERSION, _canonical(definition),
+                      tuple(int(n) for n in shape))
+        return _hashlib.sha1(repr(definition)).hexdigest()
+
+    def open(self, definition, shape):
+        """
+        Returns the SweepResults of a sweep, holding every point
+        committed so far
+        """
+
+        path = _os.path.join(self.directory, self.key(definition, shape))
+        _makedirs(path)
+        return SweepResults(path, shape)
+
+
+class SweepResults(object):
+    """
+    Values of the points of one sweep, NaN where missing
+    """
+
+    def __init__(self, path, shape):
+        """
+        Parameters
+        ----------
+        path  = directory of the sweep (see SweepStore.open)
+        shape = shape of the grid
+        """
+
+        self.path   = path
+        self.shape  = tuple(int(n) for n in shape)
+        self.values = _np.empty(self.shape)
+        self.values.fill(_np.nan)
+        self.done   = _np.zeros(self.shape, dtype=bool)
+        self._buffer = []
+        self._flushed = _time.time()
+        self.reload()
+
+    def reload(self):
+        """
+        Reads every committed chunk again, picking up those other
+        processes committed since the sweep was opened
+        """
+
+        for name in sorted(_os.listdir(self.path)):
+            if not name.startswith('chunk-'):
+                continue
+            with _np.load(_os.path.join(self.path, name)) as chunk:
+                self.values.flat[chunk['index']] = chunk['values']
+                self.done.flat[chunk['index']] = True
+
+    @property
+    def complete(self):
+        """
+        Whether every point has been committed
+        """
+
+        return self.done.all()
+
+    def missing(self):
+        """
+        Returns the flat indices of the points not committed yet
+        """
+
+        return _np.flatnonzero(~self.done)
+
+    def commit(self, index, values):
+        """
+        Writes the values of the points with flat indices index to a new
+        chunk
+        """
+
+        index  = _np.asarray(index, dtype=_np.int64).ravel()
+        values = _np.asarray(values, dtype=_np.float64).ravel()
+        assert len(index) == len(values), "Every index needs one value"
+        if len(index) == 0:
+            return
+
+        fd, tmp = _tempfile.mkstemp(prefix='.tmp-', suffix='.npz',
+                                    dir=self.path)
+        try:
+            with _os.fdopen(fd, 'wb') as f:
+                _np.savez(f, index=index, values=values)
+            # The temporary name is unique, and so is the chunk's
+            _os.rename(tmp, _os.path.join(
+                self.path, 'chunk-%.6f%s' % (_time.time(),
+                                             _os.path.basename(tmp)[4:])))
+        finally:
+            if _os.path.exists(tmp):
+                _os.remove(tmp)
+        self.values.flat[index] = values
+        self.done.flat[index] = True
+
+    def add(self, index, value, interval=1.):
+        """
+        Buffers the value of one point, committing the buffer when it is
+        older than interval seconds
+        """
+
+        self._buffer.append((index, value))
+        if _time.time() - self._flushed >= interval:
+            self.flush()
+
+    def flush(self):
+        """
+        Commits the points buffered by add
+        """
+
+        if self._buffer:
+            index, values = zip(*self._buffer)
+            self.commit(index, values)
+            self._buffer = []
+        self._flushed = _time.time()
+
+    def compute(self, func, chunks=None):
+        """
+        Computes and commits every missing point, one chunk at a time,
+        and returns the values
+
+        Parameters
+        ----------
+        func   = function taking an int array of flat grid indices and
+                 returning an array of their values
+        chunks = Optional. Sequence of flat index arrays that are
+                 computed and committed together. Defaults to one per
+                 row along the first axis of the grid (the whole grid
+                 if it has one axis).
+
+        Return Values
+        -------------
+        values = array of the grid shape
+        """
+
+        if chunks is None:
+            rows   = self.shape[0] if len(self.shape) > 1 else 1
+            chunks = _np.arange(self.values.size).reshape(rows, -1)
+        for chunk in chunks:
+            chunk = _np.asarray(chunk, dtype=_np.int64)
+            chunk = chunk[~self.done.flat[chunk]]
+            if len(chunk):
+                self.commit(chunk, func(chunk))
+        return self.values
+
+    def computeRows(self, func):
+        """
+        Computes and commits every row along the first axis of the grid
+        that has missing points, and returns the values
+
+        Parameters
+        ----------
+        func = function taking a row index j and returning the values of
+               the whole row, shaped like values[j] (or raveled)
+
+        Return Values
+        -------------
+        values = array of the grid shape
+        """
+
+        width = self.values.size//self.shape[0]
+        return self.compute(lambda i: _np.ravel(func(i[0]//width))[i % width],
+                            _np.arange(self.values.size).reshape(-1, width))
+
+
+def _makedirs(path):
+    try:
+        _os.makedirs(path)
+    except OSError as e:
+        if e.errno != _errno.EEXIST:
+            raise
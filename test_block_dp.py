@@ -0,0 +1,581 @@
+# coding: utf-8
+
+"""
+Behaviour checks of block_dp against the original solver
+
+ReferenceSolver is the recursion StrategicBlockCascadeSolver started
+from, with its sums in their original order. Every engine and option
+has to give its choices and values in every state (bit for bit, ties
+included), or the documented approximation of them.
+
+Example Use
+-----------
+
+python -m unittest -v test_block_dp
+"""
+
+import StringIO as _StringIO
+import itertools as _itertools
+import json as _json
+import os as _os
+import shutil as _shutil
+import tempfile as _tempfile
+import unittest as _unittest
+
+import numpy as _np
+
+import block_dp as bdp
+from solution_cache import SolutionCache
+
+STAR_ADJ  = ((0,1),(1,0))
+GRANT_ADJ = ((0,1,0,0,0),(1,0,1,0,0),(0,1,0,1,0),(0,0,1,0,1),(0,0,0,1,0))
+
+# (blockSizes, blockAdjacency) of small games of every kind: the paper's
+# topologies, a clique, weights that tie pi exactly and fractional
+# weights, whose utilities round
+GAMES = [((1, 4), STAR_ADJ),
+         ((4,), ((1,),)),
+         ((1, 2, 1, 2, 1), GRANT_ADJ),
+         ((2, 2), ((1, 2), (2, 1))),
+         ((2, 3), ((0.5, 1.5), (2, 0.3))),
+         ((3, 1, 3), ((1.5, 2, 1/3.), (0.1, 0, 0.3), (1.5, 1.5, 0.1)))]
+PARAMETERS = [(0, 0), (.2, .2), (.45, 1), (.3, 1.5)]
+
+
+class ReferenceSolver(object):
+    """
+    The original blockChoice/nodeChoice recursion, kept as simple as
+    possible so that it can't share a mistake with the engines
+    """
+
+    def __init__(self, p, pi, bs, ba, myopic=False):
+        self.p, self.pi, self.bs, self.ba = p, pi, bs, ba
+        self.myopic = myopic
+        self.B  = len(bs)
+        self.bc = {}
+        self.nc = {}
+
+    def blockChoice(self, ns, ys):
+        key = (ns, ys)
+        if key not in self.bc:
+            b, Ey, Ey_b = -1, 0, ()
+            for i in xrange(self.B):
+                if ns[i] == self.bs[i]:
+                    continue
+                _, Ey_bY = self.nodeChoice(i, True,  ns, ys)
+                _, Ey_bN = self.nodeChoice(i, False, ns, ys)
+                _Ey_b = tuple(self.p * y + (1 - self.p) * n for y, n in
+                              zip(Ey_bY, Ey_bN))
+                _Ey = sum(_Ey_b)
+                if _Ey >= Ey:
+                    b, Ey, Ey_b = i, _Ey, _Ey_b
+            self.bc[key] = (b, Ey_b)
+        return self.bc[key]
+
+    def nodeChoice(self, b, t, ns, ys):
+        key = (b, t, ns, ys)
+        if key in self.nc:
+            return self.nc[key]
+        _ns = ns[:b] + (ns[b] + 1,) + ns[b+1:]
+        _ys = ys[:b] + (ys[b] + 1,) + ys[b+1:]
+        last = sum(ns) == sum(self.bs) - 1
+        if last or self.myopic:
+            un = sum(a*(n - y) for a, y, n in zip(self.ba[b], ys, _ns)) + \
+                (self.pi if not t else 0)
+            uy = sum(a*y for a, y in zip(self.ba[b], _ys)) + \
+                (self.pi if t else 0)
+            choice = uy > un
+            if last:
+                Ey_b = tuple(float(y) for y in (_ys if choice else ys))
+            else:
+                Ey_b = self.blockChoice(_ns, _ys if choice else ys)[1]
+        else:
+            _, Ey_bN = self.blockChoice(_ns, ys)
+            un = sum(a * (s - y) for a, y, s in zip(self.ba[b], Ey_bN,
+                                                     self.bs)) + \
+                (self.pi if not t else 0)
+            _, Ey_bY = self.blockChoice(_ns, _ys)
+            uy = sum(a * y for a, y in zip(self.ba[b], Ey_bY)) + \
+                (self.pi if t else 0)
+            choice = uy > un
+            Ey_b = Ey_bY if choice else Ey_bN
+        self.nc[key] = (choice, Ey_b)
+        return self.nc[key]
+
+    def expectedYs(self):
+        return sum(self.blockChoice((0,)*self.B, (0,)*self.B)[1])
+
+
+def reference(solver):
+    """
+    Returns the ReferenceSolver of the game a solver plays, the bucketed
+    one with resolution
+    """
+
+    return ReferenceSolver(solver.p, solver.pi, solver.bs, solver.ba,
+                           solver.myopic)
+
+
+def states(bs):
+    """
+    Yields every (ns, ys) state of a game with block sizes bs that isn't
+    the end of it
+    """
+
+    for ns in _itertools.product(*[xrange(s + 1) for s in bs]):
+        if sum(ns) < sum(bs):
+            for ys in _itertools.product(*[xrange(n + 1) for n in ns]):
+                yield ns, ys
+
+
+def cases():
+    """
+    Yields (p, pi, blockSizes, blockAdjacency, myopic) of every game with
+    every parameter pair, for both kinds of agents
+    """
+
+    for (bs, ba), (p, pi), myopic in _itertools.product(GAMES, PARAMETERS,
+                                                        (False, True)):
+        yield p, pi, bs, ba, myopic
+
+
+class SolverTestCase(_unittest.TestCase):
+    """
+    Compares the tables of a solver with the original solver
+    """
+
+    def assertSameTables(self, expected, solver, options):
+        for ns, ys in states(expected.bs):
+            self.assertEqual(solver.blockChoice(ns, ys),
+                             expected.blockChoice(ns, ys),
+                             "%s: block choice of %s" % (options, (ns, ys)))
+            for b in xrange(expected.B):
+                if ns[b] == expected.bs[b]:
+                    continue
+                for t in (False, True):
+                    self.assertEqual(solver.nodeChoice(b, t, ns, ys),
+                                     expected.nodeChoice(b, t, ns, ys),
+                                     "%s: node choice of %s" %
+                                     (options, (b, t, ns, ys)))
+
+
+class EngineTest(SolverTestCase):
+    """
+    Every engine and storage gives the choices and values of the
+    original solver in every state
+    """
+
+    OPTIONS = [dict(),
+               dict(engine='iterative'),
+               dict(engine='iterative', storage='array'),
+               dict(storage='array'),
+               dict(engine='vectorized'),
+               dict(branchAndBound=True)]
+
+    def test_engines(self):
+        for case in cases():
+            expected = ReferenceSolver(*case)
+            for options in self.OPTIONS:
+                solver = bdp.StrategicBlockCascadeSolver(*case, **options)
+                self.assertEqual(solver.expectedYs(), expected.expectedYs(),
+                                 "%s: expectedYs() of %s" % (options, case))
+                self.assertSameTables(expected, solver, options)
+
+    def test_parallel(self):
+        for case in cases():
+            if case[2] != (1, 2, 1, 2, 1):
+                continue
+            expected = ReferenceSolver(*case)
+            options = dict(engine='parallel', workers=2)
+            solver = bdp.StrategicBlockCascadeSolver(*case, **options)
+            self.assertEqual(solver.expectedYs(), expected.expectedYs())
+            self.assertSameTables(expected, solver, options)
+
+    def test_valueOnly(self):
+        for case in cases():
+            solver = bdp.StrategicBlockCascadeSolver(
+                *case, engine='vectorized', valueOnly=True)
+            self.assertEqual(solver.expectedYs(),
+                             ReferenceSolver(*case).expectedYs())
+
+    def test_float32(self):
+        # Half the table, and the values up to the float32 rounding on a
+        # game without near ties (where that rounding may flip a choice)
+        double = bdp.StrategicBlockCascadeSolver(.3, 1.1, (1, 6), STAR_ADJ,
+                                                 engine='vectorized')
+        single = bdp.StrategicBlockCascadeSolver(.3, 1.1, (1, 6), STAR_ADJ,
+                                                 engine='vectorized',
+                                                 dtype='float32')
+        self.assertAlmostEqual(single.expectedYs(), double.expectedYs(), 5)
+        self.assertLess(single.tableBytes(), double.tableBytes())
+
+    def test_fractionalTie(self):
+        # pi=0 and a node of block 1 weighs No at .3*(3-1) and Yes at
+        # .3*(1+1). Summed from the neighbourhood counts, .3*2 + .3 - .3
+        # rounds below them and the tie went the other way.
+        ba = ((0.5, 1.5), (2, 0.3))
+        for options in self.OPTIONS:
+            solver = bdp.StrategicBlockCascadeSolver(0, 0, (2, 3), ba, True,
+                                                     **options)
+            self.assertEqual(solver.blockChoice((0, 2), (0, 1)),
+                             (1, (0.0, 1.0)), options)
+
+    def test_resolution(self):
+        # Bucketed games have fractional weights (7/3 and 5/2 here), and
+        # pi makes some node utilities tie exactly
+        for bs, ba, pi in (((5,7), ((1,1),(1,1)), 2.5),
+                           ((2,5,1,7,2), GRANT_ADJ, 7/3.)):
+            for myopic in (False, True):
+                for options in self.OPTIONS:
+                    solver = bdp.StrategicBlockCascadeSolver(
+                        .3, pi, bs, ba, myopic, resolution=3, **options)
+                    expected = reference(solver)
+                    root = expected.blockChoice((0,)*solver.B, (0,)*solver.B)
+                    self.assertEqual(solver.expectedYs(), sum(
+                        w*y for w, y in zip(solver.weights, root[1])), options)
+                    self.assertSameTables(expected, solver, options)
+
+
+class StatsTest(_unittest.TestCase):
+    """
+    SolverStats counts what the solver did without changing it
+    """
+
+    def test_results(self):
+        for case in cases():
+            for options in EngineTest.OPTIONS[1:]:
+                plain = bdp.StrategicBlockCascadeSolver(*case, **options)
+                solver = bdp.StrategicBlockCascadeSolver(*case, stats=True,
+                                                         **options)
+                self.assertEqual(solver.expectedYs(), plain.expectedYs())
+                self.assertEqual(dict(solver.bc.iteritems()),
+                                 dict(plain.bc.iteritems()), options)
+                self.assertEqual(dict(solver.nc.iteritems()),
+                                 dict(plain.nc.iteritems()), options)
+
+    def countedReference(self, case):
+        """
+        Returns a ReferenceSolver of case and a list holding the number
+        of blockChoice calls made on it so far
+        """
+
+        expected = ReferenceSolver(*case)
+        lookups = [0]
+        blockChoice = expected.blockChoice
+        def counted(ns, ys):
+            lookups[0] += 1
+            return blockChoice(ns, ys)
+        expected.blockChoice = counted
+        return expected, lookups
+
+    def test_lookups(self):
+        for case in cases():
+            expected, lookups = self.countedReference(case)
+            expected.expectedYs()
+            lookups = lookups[0]
+            everywhere, children = self.countedReference(case)
+            for ns, ys in states(case[2]):
+                everywhere.blockChoice(ns, ys)
+            total = len(everywhere.bc)
+            children = children[0] - total
+
+            # Every state it reaches is computed once, and every other
+            # lookup of it is a hit
+            solver = bdp.StrategicBlockCascadeSolver(*case, stats=True)
+            solver.expectedYs()
+            summary = solver.stats.summary()
+            self.assertEqual(summary['blockMisses'], len(expected.bc))
+            self.assertEqual(summary['blockMisses'], len(solver.bc))
+            self.assertEqual(summary['nodeMisses'], len(solver.nc))
+            self.assertEqual(summary['nodeHits'], 0)
+            self.assertEqual(summary['blockHits'] + summary['blockMisses'],
+                             lookups)
+            self.assertEqual(summary['states'], summary['blockMisses'])
+            self.assertEqual(summary['hitRate'], float(summary['blockHits'])/(
+                lookups + summary['nodeMisses']))
+
+            # The iterative engine computes every state before any lookup
+            # of it, so the lookups of the children of every state and the
+            # one of the empty state by expectedYs() are all hits
+            solver = bdp.StrategicBlockCascadeSolver(*case, stats=True,
+                                                     engine='iterative')
+            solver.expectedYs()
+            iterative = solver.stats.summary()
+            self.assertEqual(iterative['blockMisses'], total)
+            self.assertEqual(iterative['nodeMisses'], len(solver.nc))
+            self.assertEqual(iterative['blockHits'], children + 1)
+
+            # One more lookup is one more hit
+            solver.blockChoice((0,)*solver.B, (0,)*solver.B)
+            self.assertEqual(solver.stats.summary()['blockHits'],
+                             iterative['blockHits'] + 1)
+
+    def test_layers(self):
+        bs = (1, 2, 1, 2, 1)
+        layers = {}
+        for ns, _ in states(bs):
+            layers[sum(ns)] = layers.get(sum(ns), 0) + 1
+        for engine in ('iterative', 'vectorized', 'parallel'):
+            solver = bdp.StrategicBlockCascadeSolver(.3, 1.1, bs, GRANT_ADJ,
+                                                     engine=engine,
+                                                     stats=True)
+            solver.expectedYs()
+            summary = solver.stats.summary()
+            self.assertEqual(summary['layerStates'], layers, engine)
+            self.assertEqual(sorted(summary['layerTime']), sorted(layers))
+            self.assertEqual(summary['states'], sum(layers.values()))
+            self.assertEqual(summary['tableBytes'], solver.tableBytes())
+            if engine != 'iterative':
+                # Whole layers at once, no lookups to count
+                for name in ('blockHits', 'blockMisses', 'nodeHits',
+                             'nodeMisses', 'hitRate'):
+                    self.assertIsNone(summary[name], engine)
+
+    def test_trace(self):
+        solver = bdp.StrategicBlockCascadeSolver(.3, 1.1, (1, 2, 1, 2, 1),
+                                                 GRANT_ADJ, engine='iterative',
+                                                 stats=True)
+        solver.expectedYs()
+        out = _StringIO.StringIO()
+        solver.stats.writeTrace(out)
+        names = [e['name'] for e in _json.loads(out.getvalue())['traceEvents']]
+        self.assertEqual(sorted(names), sorted(['solve'] + [
+            'layer %d' % k for k in xrange(sum(solver.bs))]))
+
+
+class DecomposeTest(SolverTestCase):
+    """
+    Neighbour lists play the same game as the matrix, and independent
+    components add up to the joint game
+    """
+
+    SPLIT_ADJ = ((1, 2, 0, 0), (2, 0, 0, 0), (0, 0, 0, 1.5), (0, 0, 0.5, 1))
+
+    def test_adjacencyRoundTrip(self):
+        for bs, ba in GAMES + [((2, 2, 1, 3), self.SPLIT_ADJ)]:
+            self.assertEqual(bdp.denseAdjacency(bdp.sparseAdjacency(ba)), ba)
+        self.assertEqual(bdp.sparseAdjacency(STAR_ADJ), (((1, 1),), ((0, 1),)))
+        self.assertRaises(AssertionError, bdp.denseAdjacency,
+                          (((1, 1), (1, 2)), ()))
+        self.assertRaises(AssertionError, bdp.denseAdjacency, (((2, 1),), ()))
+
+    def test_sparseInput(self):
+        for p, pi, bs, ba, myopic in cases():
+            expected = ReferenceSolver(p, pi, bs, ba, myopic)
+            for options in ({}, dict(engine='vectorized')):
+                solver = bdp.StrategicBlockCascadeSolver(
+                    p, pi, bs, bdp.sparseAdjacency(ba), myopic, **options)
+                self.assertEqual(solver.ba, ba)
+                self.assertEqual(solver.expectedYs(), expected.expectedYs())
+                self.assertSameTables(expected, solver, options)
+
+    def test_blockComponents(self):
+        self.assertEqual(bdp.blockComponents(GRANT_ADJ), ((0, 1, 2, 3, 4),))
+        self.assertEqual(bdp.blockComponents(self.SPLIT_ADJ), ((0, 1), (2, 3)))
+        # Weight in one direction is enough to join two blocks
+        self.assertEqual(bdp.blockComponents(((0, 0, 0), (0, 0, 0), (1, 0, 0))),
+                         ((0, 2), (1,)))
+        self.assertEqual(bdp.blockComponents(((0, 0), (0, 0))), ((0,), (1,)))
+
+    def test_decompose(self):
+        for (p, pi), myopic in _itertools.product(PARAMETERS, (False, True)):
+            for bs, ba in (((2, 2, 1, 3), self.SPLIT_ADJ),
+                           ((1, 3, 2), ((0, 1, 0), (1, 0, 0), (0, 0, 1)))):
+                whole = bdp.StrategicBlockCascadeSolver(p, pi, bs, ba, myopic)
+                split = bdp.StrategicBlockCascadeSolver(p, pi, bs, ba, myopic,
+                                                        decompose=True)
+                self.assertAlmostEqual(split.expectedYs(), whole.expectedYs(),
+                                       12)
+                for component, solver in zip(split.components,
+                                             split.componentSolvers()):
+                    self.assertEqual(solver.bs,
+                                     tuple(bs[i] for i in component))
+                    self.assertEqual(solver.expectedYs(), ReferenceSolver(
+                        p, pi, solver.bs, solver.ba, myopic).expectedYs())
+            # A single component is the joint game itself
+            solver = bdp.StrategicBlockCascadeSolver(p, pi, (1, 2, 1, 2, 1),
+                                                     GRANT_ADJ, myopic,
+                                                     decompose=True)
+            self.assertEqual(solver.expectedYs(), ReferenceSolver(
+                p, pi, (1, 2, 1, 2, 1), GRANT_ADJ, myopic).expectedYs())
+
+
+class ResolutionTest(_unittest.TestCase):
+    """
+    The bucketed game counts every utility in nodes, and
+    approximationError measures it against the exact game
+    """
+
+    def test_exact(self):
+        # Buckets of one node are the game itself
+        for p, pi, bs, ba, myopic in cases():
+            solver = bdp.StrategicBlockCascadeSolver(p, pi, bs, ba, myopic,
+                                                     resolution=1)
+            self.assertEqual((solver.bs, solver.ba), (bs, ba))
+            self.assertEqual(solver.expectedYs(), ReferenceSolver(
+                p, pi, bs, ba, myopic).expectedYs())
+
+    def test_buckets(self):
+        solver = bdp.StrategicBlockCascadeSolver(.3, 1.1, (1, 12, 7),
+                                                 ((0, 1, 1), (1, 0, 0),
+                                                  (2, 0, 0)), resolution=5)
+        self.assertEqual(solver.fineSizes, (1, 12, 7))
+        self.assertEqual(solver.bs, (1, 3, 2))
+        self.assertEqual(solver.weights, (1.0, 4.0, 3.5))
+        self.assertEqual(solver.ba, ((0, 4, 3.5), (1, 0, 0), (2, 0, 0)))
+        # Nodes to the nearest bucket, and never past the end of a block
+        self.assertEqual(solver.bucketState((1, 7, 2), (0, 4, 2)),
+                         ((1, 2, 1), (0, 1, 1)))
+        self.assertEqual(solver.bucketState((1, 12, 7), (1, 12, 7)),
+                         ((1, 3, 2), (1, 3, 2)))
+        for ns in _itertools.product(*[xrange(s + 1) for s in solver.bs]):
+            fine = tuple(n*w for n, w in zip(ns, solver.weights))
+            self.assertEqual(solver.bucketState(fine, fine), (ns, ns))
+
+    def test_approximationError(self):
+        resolutions = [1, 2, 3, 6]
+        for bs, ba in (((1, 8), STAR_ADJ), ((1, 4, 1, 5, 2), GRANT_ADJ)):
+            for (p, pi), myopic in _itertools.product(PARAMETERS,
+                                                      (False, True)):
+                exact, approx, error = bdp.approximationError(
+                    p, pi, bs, ba, resolutions, myopic)
+                self.assertEqual(exact, ReferenceSolver(
+                    p, pi, bs, ba, myopic).expectedYs())
+                for r, value in zip(resolutions, approx):
+                    self.assertEqual(value, bdp.StrategicBlockCascadeSolver(
+                        p, pi, bs, ba, myopic, resolution=r).expectedYs())
+                # No bound beyond the number of nodes (see its docstring)
+                self.assertTrue(((approx >= 0) & (approx <= sum(bs))).all())
+                if exact:
+                    self.assertTrue((error == (approx - exact)/exact).all())
+                    self.assertEqual(error[0], 0)
+                else:
+                    self.assertTrue((error == 0).all())
+
+
+class CacheTest(SolverTestCase):
+    """
+    Cached tables serve the solved game, and the cache drops its least
+    recently used entries
+    """
+
+    def setUp(self):
+        self.directory = _tempfile.mkdtemp(prefix='test_block_dp-')
+
+    def tearDown(self):
+        _shutil.rmtree(self.directory)
+
+    def entries(self):
+        return sorted(key for key in _os.listdir(self.directory)
+                      if not key.startswith('.'))
+
+    def test_solver(self):
+        cache = SolutionCache(self.directory)
+        for p, pi, bs, ba, myopic in cases():
+            expected = ReferenceSolver(p, pi, bs, ba, myopic)
+            for engine in ('iterative', 'vectorized'):
+                options = dict(engine=engine, storage='array', cache=cache)
+                solver = bdp.StrategicBlockCascadeSolver(p, pi, bs, ba,
+                                                         myopic, **options)
+                key = solver.cacheKey
+                self.assertEqual(solver.expectedYs(), expected.expectedYs())
+                self.assertIn(key, self.entries())
+                # The second solver is served from the memory mapped entry
+                solver = bdp.StrategicBlockCascadeSolver(p, pi, bs, ba,
+                                                         myopic, **options)
+                self.assertIsInstance(solver.bc.choice, _np.memmap)
+                self.assertEqual(solver.expectedYs(), expected.expectedYs())
+                self.assertSameTables(expected, solver, options)
+
+    def test_key(self):
+        cache = SolutionCache(self.directory)
+        key = cache.key(.3, 1.1, (1, 4), STAR_ADJ, False)
+        self.assertEqual(key, cache.key(.3, 1.1, [1, 4], STAR_ADJ, False))
+        for other in ((.2, 1.1, (1, 4), STAR_ADJ, False),
+                      (.3, 1.2, (1, 4), STAR_ADJ, False),
+                      (.3, 1.1, (1, 5), STAR_ADJ, False),
+                      (.3, 1.1, (1, 4), ((0, 2), (1, 0)), False),
+                      (.3, 1.1, (1, 4), STAR_ADJ, True)):
+            self.assertNotEqual(key, cache.key(*other))
+        self.assertNotEqual(key, cache.key(.3, 1.1, (1, 4), STAR_ADJ, False,
+                                           'float32'))
+
+    def test_evict(self):
+        cache  = SolutionCache(self.directory)
+        arrays = {'Ey': _np.zeros(1000)}
+        for key in ('a', 'b'):
+            cache.store(key, arrays)
+        self.assertEqual(cache.load('a')['Ey'].shape, (1000,))
+        self.assertEqual(cache.load('missing'), None)
+        # Make a the oldest entry, then read it so b is instead
+        _os.utime(_os.path.join(self.directory, 'a'), (1000, 1000))
+        _os.utime(_os.path.join(self.directory, 'b'), (2000, 2000))
+        cache.load('a')
+        size = sum(_os.path.getsize(_os.path.join(self.directory, 'a', name))
+                   for name in _os.listdir(_os.path.join(self.directory, 'a')))
+        cache.maxBytes = 2*size
+        cache.store('c', arrays)
+        self.assertEqual(self.entries(), ['a', 'c'])
+        # A second writer of an entry keeps the first copy, and leaves no
+        # temporary directories behind
+        cache.store('c', {'Ey': _np.ones(1000)})
+        self.assertEqual(cache.load('c')['Ey'][0], 0)
+        self.assertEqual(sorted(_os.listdir(self.directory)), ['a', 'c'])
+        cache.maxBytes = 0
+        cache.evict()
+        self.assertEqual(_os.listdir(self.directory), [])
+
+
+class SweepTest(_unittest.TestCase):
+    """
+    The batched solves give expectedYs() of one solver per game
+    """
+
+    def test_expectedYsGrid(self):
+        P, PI = _np.meshgrid([0, .2, .45], [0, .5, 1.5])
+        for bs, ba in GAMES:
+            for myopic in (False, True):
+                Ey = bdp.expectedYsGrid(P, PI, bs, ba, myopic)
+                for p, pi, value in zip(P.flat, PI.flat, Ey.flat):
+                    self.assertEqual(value, bdp.StrategicBlockCascadeSolver(
+                        p, pi, bs, ba, myopic).expectedYs())
+
+    def test_solveSizeRange(self):
+        n = range(1, 7)
+        for template, ba in (((1, None), STAR_ADJ),
+                             ((None,), ((1,),)),
+                             ((2, None), ((0.5, 1.5), (2, 0.3)))):
+            for myopic in (False, True):
+                Ey = bdp.solveSizeRange(.3, 1.1, template, n, ba, myopic)
+                for m, value in zip(n, Ey):
+                    bs = tuple(m if s is None else s for s in template)
+                    self.assertEqual(value, bdp.StrategicBlockCascadeSolver(
+                        .3, 1.1, bs, ba, myopic).expectedYs())
+
+    def test_strategicMyopic(self):
+        p = _np.array([.1, .3, .45])
+        strategic, myopic, ratio = bdp.strategicMyopic(p, 1.1, (1, 2, 1, 2, 1),
+                                                       GRANT_ADJ)
+        for i, pv in enumerate(p):
+            for values, agents in ((strategic, False), (myopic, True)):
+                self.assertEqual(values[i], bdp.StrategicBlockCascadeSolver(
+                    pv, 1.1, (1, 2, 1, 2, 1), GRANT_ADJ, agents).expectedYs())
+        self.assertTrue((ratio == strategic/myopic).all())
+
+    def test_piIntervals(self):
+        for bs, ba in GAMES[:3]:
+            for myopic in (False, True):
+                starts, Ey = bdp.piIntervals(.3, bs, ba, myopic, (.1, 2))
+                self.assertEqual(starts[0], .1)
+                self.assertTrue((_np.diff(starts) > 0).all())
+                # Each interval at its start, its end and in between
+                ends = _np.append(_np.nextafter(starts[1:], 0), 2)
+                for pi, value in zip(_np.concatenate([starts, ends,
+                                                      (starts + ends)/2]),
+                                     _np.tile(Ey, 3)):
+                    self.assertEqual(value, bdp.StrategicBlockCascadeSolver(
+                        .3, pi, bs, ba, myopic).expectedYs())
+
+
+if __name__ == '__main__':
+    _unittest.main()